@@ -3,12 +3,18 @@ Telegram Bot for copying VK posts.
 Main bot implementation with command handlers.
 """
 
+import asyncio
+import html
 import logging
-import json
+import queue
+import re
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Optional
 from pathlib import Path
-from telegram import Update, Bot
+from telegram import Update, Bot, Message
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -18,71 +24,285 @@ from telegram.ext import (
     filters,
 )
 from telegram.constants import ParseMode
+from telegram.error import TelegramError
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    import json
+
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
 
 from config import Config
 from vk_client import VKClient
 from media_handler import MediaHandler
-
-# Configure logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    filename="bot.log",
-    filemode="a"
+from store import CacheStore
+
+# Configure logging: records are queued and written to a rotating
+# log file by a background thread, off the event loop
+log_queue: queue.Queue = queue.Queue(-1)
+log_file_handler = RotatingFileHandler(
+    "bot.log",
+    maxBytes=10_000_000,
+    backupCount=5,
+    encoding="utf-8"
+)
+log_file_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 )
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+log_listener = QueueListener(log_queue, log_file_handler, respect_handler_level=True)
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 # Conversation states
 SELECT_GROUP, SELECT_START_DATE, SELECT_END_DATE, SELECT_COUNT = range(4)
 SETCHAT_WAIT_ID = 100  # State for waiting chat ID
 
+# Plain text replies (not commands) during a conversation
+TEXT_INPUT = filters.TEXT & ~filters.COMMAND
+
 # File to store target chat ID
 TARGET_CHAT_FILE = Path("target_chat.json")
 
+# Valid chat ID: optional minus sign followed by digits
+CHAT_ID_PATTERN = re.compile(r"-?[0-9]{1,20}")
+
+
+# Static message texts, built once at import
+START_MESSAGE = (
+    "👋 <b>Добро пожаловать в VK to Telegram Bot!</b>\n\n"
+    "Этот бот копирует посты из сообществ ВКонтакте в Telegram.\n"
+    "Поддерживается копирование фото, видео, документов и ссылок.\n\n"
+    "<b>📋 Основные команды:</b>\n"
+    "/copy - Начать копирование постов из VK\n"
+    "/help - Показать справку по использованию\n"
+    "/status - Проверить статус бота\n\n"
+    "<b>⚙️ Настройки:</b>\n"
+    "/setchat - Установить чат для копирования постов\n"
+    "/getchat - Показать текущий чат для копирования\n"
+    "/clearchat - Сбросить настройки чата\n\n"
+    "<b>💡 Как начать:</b>\n"
+    "1. Отправьте /copy\n"
+    "2. Введите название или ID группы VK\n"
+    "3. Укажите период дат\n"
+    "4. Выберите количество постов\n\n"
+    "Бот скопирует все посты с медиа в выбранный чат!"
+)
+
+HELP_MESSAGE = (
+    "📖 <b>Справка</b>\n\n"
+    "<b>Как использовать:</b>\n"
+    "1. Используйте /copy для начала копирования\n"
+    "2. Введите название или ID группы VK\n"
+    "3. Укажите начальную дату (ГГГГ-ММ-ДД)\n"
+    "4. Укажите конечную дату (ГГГГ-ММ-ДД)\n"
+    "5. Введите количество постов (1-100)\n\n"
+    "<b>Примечания:</b>\n"
+    "- Все медиа (фото, видео, документы) будут скопированы\n"
+    "- Посты копируются в хронологическом порядке\n"
+    "- Копирование больших объёмов может занять время"
+)
+
+SETCHAT_HEADER = "📍 <b>Настройка целевого чата</b>\n\n"
+
+SETCHAT_INSTRUCTIONS = (
+    "<b>Отправьте ID чата следующим сообщением.</b>\n\n"
+    "Как узнать ID чата:\n"
+    "1. Добавьте бота @userinfobot в ваш канал/группу\n"
+    "2. Он покажет ID (например: -1001234567890)\n"
+    "3. Скопируйте ID и отправьте мне\n\n"
+    "Или используйте:\n"
+    "/cancel - отменить\n"
+    "/getchat - показать текущий чат"
+)
+
+GETCHAT_MESSAGE = (
+    "📍 <b>Текущий целевой чат:</b>\n\n"
+    "ID: <code>{chat_id}</code>\n\n"
+    "Команды:\n"
+    "/setchat - Изменить чат\n"
+    "/clearchat - Сбросить настройки"
+)
+
+NO_TARGET_CHAT_MESSAGE = (
+    "ℹ️ <b>Целевой чат не настроен.</b>\n\n"
+    "Посты будут копироваться в тот чат, где отправлена команда <code>/copy</code>.\n\n"
+    "Команды:\n"
+    "/setchat - Установить целевой чат\n"
+    "/getchat - Показать текущий чат"
+)
+
+CLEARCHAT_MESSAGE = (
+    "✅ <b>Настройки сброшены!</b>\n\n"
+    "Теперь посты будут копироваться в тот чат, где отправлена команда <code>/copy</code>.\n\n"
+    "Команды:\n"
+    "/setchat - Установить целевой чат\n"
+    "/getchat - Показать текущий чат"
+)
+
+STATUS_MESSAGE = (
+    "✅ <b>Статус бота: Онлайн</b>\n\n"
+    "Версия VK API: {api_version}\n"
+    "Готов к копированию постов!"
+)
+
+CHAT_SET_MESSAGE = (
+    "✅ <b>Целевой чат установлен!</b>\n\n"
+    "ID: <code>{chat_id}</code>\n\n"
+    "Теперь все посты будут копироваться в этот чат.\n\n"
+    "Команды:\n"
+    "/getchat - Показать текущий чат\n"
+    "/clearchat - Сбросить настройки\n"
+    "/setchat - Изменить чат"
+)
+
+COPY_STARTED_MESSAGE = (
+    "🚀 <b>Запуск процесса копирования...</b>\n\n"
+    "Группа: <code>{group_name}</code>\n"
+    "Период: <code>{start_date:%Y-%m-%d}</code> - <code>{end_date:%Y-%m-%d}</code>\n"
+    "Постов: <code>{count}</code>\n"
+    "Чат назначения: <code>{chat_id}</code>\n\n"
+    "⏳ Это может занять некоторое время..."
+)
+
+POSTS_FOUND_MESSAGE = "📊 Найдено <code>{total}</code> постов. Начинаю копирование..."
+
+COPY_DONE_MESSAGE = (
+    "✅ <b>Копирование завершено!</b>\n\n"
+    "Успешно скопировано: <code>{success_count}/{total}</code> постов"
+)
+
+
+@dataclass(slots=True)
+class CopySession:
+    """State of one /copy conversation, kept in context.user_data."""
+
+    group_id: int | str = 0
+    group_name: str = ""
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    count: int = 50
+
+
+@dataclass(slots=True)
+class CopyProgress:
+    """Counters of a running copy job, read by the progress reporter."""
+
+    total: int
+    done: int = 0
+    copied: int = 0
+
+
+def _parse_date(date_str: str) -> datetime:
+    """Parse a YYYY-MM-DD date. Raises ValueError on any other input."""
+    # Reject junk early; fromisoformat also accepts times and other ISO forms
+    if len(date_str) != 10 or date_str[4] != "-" or date_str[7] != "-":
+        raise ValueError(f"Invalid date: {date_str!r}")
+    return datetime.fromisoformat(date_str)
+
+
+def _read_chat_file() -> dict:
+    """Read target chat file (blocking, called once at startup)."""
+    return _json_loads(TARGET_CHAT_FILE.read_bytes())
+
+
+def _write_chat_file(chat_id: str) -> None:
+    """Write target chat file (blocking, run in a worker thread)."""
+    TARGET_CHAT_FILE.write_bytes(_json_dumps({'chat_id': chat_id}))
+
 
 class VKTelegramBot:
     """Main bot class."""
 
     def __init__(self):
-        self.vk_client = VKClient()
+        self.store = CacheStore(Config.CACHE_DB_FILE)
+        self.vk_client = VKClient(self.store)
         self.bot: Optional[Bot] = None
         self.media_handler: Optional[MediaHandler] = None
-        self.user_data = {}
-        self.setchat_user = None  # User ID waiting for chat ID input
-
-    def _get_target_chat_id(self) -> Optional[str]:
-        """Get target chat ID from file or config."""
+        self.default_chat_id: Optional[str] = Config.TARGET_CHAT_ID
+        # Target chat is read from disk once; save/clear keep it in sync
+        self._target_chat_id: Optional[str] = self._load_target_chat_id()
+        # Debounced target chat file writes
+        self._pending_chat_id: Optional[str] = None
+        self._chat_file_dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self.status_message = STATUS_MESSAGE.format(api_version=Config.VK_API_VERSION)
+        # Bounds concurrent post sends across all running copy jobs
+        self._copy_semaphore = asyncio.Semaphore(Config.COPY_CONCURRENCY)
+        # One post at a time per target chat, so posts of concurrent jobs
+        # don't interleave their albums, videos and links
+        self._chat_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def _load_target_chat_id(self) -> Optional[str]:
+        """Load target chat ID from file or config."""
         # First check if we have saved chat ID
-        if TARGET_CHAT_FILE.exists():
-            try:
-                with open(TARGET_CHAT_FILE, 'r') as f:
-                    data = json.load(f)
-                    chat_id = data.get('chat_id')
-                    if chat_id:
-                        return str(chat_id)
-            except Exception as e:
-                logger.error(f"Error reading target chat file: {e}")
+        try:
+            data = _read_chat_file()
+            chat_id = data.get('chat_id')
+            if chat_id:
+                return str(chat_id)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Error reading target chat file: %s", e)
         
         # Fall back to config
-        return Config.TARGET_CHAT_ID or None
+        return self.default_chat_id
 
-    def _save_target_chat_id(self, chat_id: str) -> None:
-        """Save target chat ID to file."""
-        try:
-            with open(TARGET_CHAT_FILE, 'w') as f:
-                json.dump({'chat_id': chat_id}, f)
-            logger.info(f"Saved target chat ID: {chat_id}")
-        except Exception as e:
-            logger.error(f"Error saving target chat ID: {e}")
+    def _get_target_chat_id(self) -> Optional[str]:
+        """Get target chat ID (in-memory, no disk access); None if unset."""
+        return self._target_chat_id
+
+    async def _save_target_chat_id(self, chat_id: str) -> None:
+        """Save target chat ID; the file write is debounced."""
+        self._target_chat_id = chat_id
+        self._schedule_chat_file_write(chat_id)
+
+    async def _clear_target_chat_id(self) -> None:
+        """Clear saved target chat ID; the file removal is debounced."""
+        self._target_chat_id = self.default_chat_id
+        self._schedule_chat_file_write(None)
+
+    def _schedule_chat_file_write(self, chat_id: Optional[str]) -> None:
+        """Mark the target chat file dirty and start a writer if needed."""
+        self._pending_chat_id = chat_id
+        self._chat_file_dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._write_target_chat_file())
+
+    async def _write_target_chat_file(self) -> None:
+        """Write the latest target chat ID once changes settle."""
+        while self._chat_file_dirty:
+            # Let a burst of /setchat or /clearchat calls collapse into one write
+            await asyncio.sleep(Config.CHAT_SAVE_DELAY)
+            self._chat_file_dirty = False
+            chat_id = self._pending_chat_id
 
-    def _clear_target_chat_id(self) -> None:
-        """Clear saved target chat ID."""
-        try:
-            if TARGET_CHAT_FILE.exists():
-                TARGET_CHAT_FILE.unlink()
-            logger.info("Cleared target chat ID")
-        except Exception as e:
-            logger.error(f"Error clearing target chat ID: {e}")
+            try:
+                if chat_id is None:
+                    await asyncio.to_thread(TARGET_CHAT_FILE.unlink, missing_ok=True)
+                    logger.info("Cleared target chat ID")
+                else:
+                    await asyncio.to_thread(_write_chat_file, chat_id)
+                    logger.info("Saved target chat ID: %s", chat_id)
+            except Exception as e:
+                logger.error("Error writing target chat file: %s", e)
+
+    async def post_shutdown(self, application: Application) -> None:
+        """Finish pending work before the application stops."""
+        if self._save_task and not self._save_task.done():
+            await self._save_task
+        if self.media_handler:
+            await self.media_handler.close()
+        await self.vk_client.close()
+        await asyncio.to_thread(self.store.close)
 
     async def set_chat(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Handle /setchat command - start waiting for chat ID."""
@@ -93,24 +313,12 @@ class VKTelegramBot:
             )
             return ConversationHandler.END
         
-        # Set user as waiting for chat ID
-        self.setchat_user = update.effective_user.id
-        
         # Get current target chat info
         current_chat_id = self._get_target_chat_id()
         current_info = f"Текущий чат: <code>{current_chat_id}</code>\n\n" if current_chat_id else ""
         
         await update.message.reply_text(
-            f"📍 <b>Настройка целевого чата</b>\n\n"
-            f"{current_info}"
-            f"<b>Отправьте ID чата следующим сообщением.</b>\n\n"
-            f"Как узнать ID чата:\n"
-            f"1. Добавьте бота @userinfobot в ваш канал/группу\n"
-            f"2. Он покажет ID (например: -1001234567890)\n"
-            f"3. Скопируйте ID и отправьте мне\n\n"
-            f"Или используйте:\n"
-            f"/cancel - отменить\n"
-            f"/getchat - показать текущий чат",
+            SETCHAT_HEADER + current_info + SETCHAT_INSTRUCTIONS,
             parse_mode=ParseMode.HTML
         )
         
@@ -118,16 +326,10 @@ class VKTelegramBot:
 
     async def receive_chat_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Receive chat ID from user."""
-        user_id = update.effective_user.id
-        
-        # Check if this user is waiting for chat ID
-        if user_id != self.setchat_user:
-            return ConversationHandler.END
-        
         chat_id_text = update.message.text.strip()
         
         # Validate chat ID (should be like -1001234567890 or 123456789)
-        if not chat_id_text.lstrip('-').isdigit():
+        if not CHAT_ID_PATTERN.fullmatch(chat_id_text):
             await update.message.reply_text(
                 "❌ Неверный формат ID.\n\n"
                 "ID должен быть числом, например: -1001234567890\n"
@@ -136,17 +338,10 @@ class VKTelegramBot:
             return SETCHAT_WAIT_ID
         
         # Save chat ID
-        self._save_target_chat_id(chat_id_text)
-        self.setchat_user = None
+        await self._save_target_chat_id(chat_id_text)
         
         await update.message.reply_text(
-            f"✅ <b>Целевой чат установлен!</b>\n\n"
-            f"ID: <code>{chat_id_text}</code>\n\n"
-            f"Теперь все посты будут копироваться в этот чат.\n\n"
-            f"Команды:\n"
-            f"/getchat - Показать текущий чат\n"
-            f"/clearchat - Сбросить настройки\n"
-            f"/setchat - Изменить чат",
+            CHAT_SET_MESSAGE.format(chat_id=chat_id_text),
             parse_mode=ParseMode.HTML
         )
         
@@ -154,11 +349,6 @@ class VKTelegramBot:
 
     async def cancel_setchat(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Cancel setchat operation."""
-        user_id = update.effective_user.id
-        
-        if user_id == self.setchat_user:
-            self.setchat_user = None
-        
         await update.message.reply_text(
             "❌ Отменено.\n\n"
             f"/setchat - начать настройку заново"
@@ -172,87 +362,39 @@ class VKTelegramBot:
         
         if target_chat_id:
             await update.message.reply_text(
-                f"📍 <b>Текущий целевой чат:</b>\n\n"
-                f"ID: <code>{target_chat_id}</code>\n\n"
-                f"Команды:\n"
-                f"/setchat - Изменить чат\n"
-                f"/clearchat - Сбросить настройки",
+                GETCHAT_MESSAGE.format(chat_id=target_chat_id),
                 parse_mode=ParseMode.HTML
             )
         else:
             await update.message.reply_text(
-                "ℹ️ <b>Целевой чат не настроен.</b>\n\n"
-                f"Посты будут копироваться в тот чат, где отправлена команда <code>/copy</code>.\n\n"
-                f"Команды:\n"
-                f"/setchat - Установить целевой чат\n"
-                f"/getchat - Показать текущий чат",
+                NO_TARGET_CHAT_MESSAGE,
                 parse_mode=ParseMode.HTML
             )
 
     async def clear_chat(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /clearchat command - clear target chat settings."""
-        self._clear_target_chat_id()
+        await self._clear_target_chat_id()
         
         await update.message.reply_text(
-            "✅ <b>Настройки сброшены!</b>\n\n"
-            f"Теперь посты будут копироваться в тот чат, где отправлена команда <code>/copy</code>.\n\n"
-            f"Команды:\n"
-            f"/setchat - Установить целевой чат\n"
-            f"/getchat - Показать текущий чат",
+            CLEARCHAT_MESSAGE,
             parse_mode=ParseMode.HTML
         )
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /start command."""
-        await update.message.reply_text(
-            "👋 <b>Добро пожаловать в VK to Telegram Bot!</b>\n\n"
-            "Этот бот копирует посты из сообществ ВКонтакте в Telegram.\n"
-            "Поддерживается копирование фото, видео, документов и ссылок.\n\n"
-            "<b>📋 Основные команды:</b>\n"
-            "/copy - Начать копирование постов из VK\n"
-            "/help - Показать справку по использованию\n"
-            "/status - Проверить статус бота\n\n"
-            "<b>⚙️ Настройки:</b>\n"
-            "/setchat - Установить чат для копирования постов\n"
-            "/getchat - Показать текущий чат для копирования\n"
-            "/clearchat - Сбросить настройки чата\n\n"
-            "<b>💡 Как начать:</b>\n"
-            "1. Отправьте /copy\n"
-            "2. Введите название или ID группы VK\n"
-            "3. Укажите период дат\n"
-            "4. Выберите количество постов\n\n"
-            "Бот скопирует все посты с медиа в выбранный чат!",
-            parse_mode=ParseMode.HTML
-        )
+        await update.message.reply_text(START_MESSAGE, parse_mode=ParseMode.HTML)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /help command."""
-        await update.message.reply_text(
-            "📖 <b>Справка</b>\n\n"
-            "<b>Как использовать:</b>\n"
-            "1. Используйте /copy для начала копирования\n"
-            "2. Введите название или ID группы VK\n"
-            "3. Укажите начальную дату (ГГГГ-ММ-ДД)\n"
-            "4. Укажите конечную дату (ГГГГ-ММ-ДД)\n"
-            "5. Введите количество постов (1-100)\n\n"
-            "<b>Примечания:</b>\n"
-            "- Все медиа (фото, видео, документы) будут скопированы\n"
-            "- Посты копируются в хронологическом порядке\n"
-            "- Копирование больших объёмов может занять время",
-            parse_mode=ParseMode.HTML
-        )
+        await update.message.reply_text(HELP_MESSAGE, parse_mode=ParseMode.HTML)
 
     async def status(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /status command."""
-        await update.message.reply_text(
-            "✅ <b>Статус бота: Онлайн</b>\n\n"
-            f"Версия VK API: {Config.VK_API_VERSION}\n"
-            f"Готов к копированию постов!",
-            parse_mode=ParseMode.HTML
-        )
+        await update.message.reply_text(self.status_message, parse_mode=ParseMode.HTML)
     
     async def copy_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start the copy process."""
+        context.user_data["session"] = CopySession()
         await update.message.reply_text(
             "📋 <b>Копирование постов из VK</b>\n\n"
             "Введите название или ID группы VK.\n"
@@ -263,13 +405,14 @@ class VKTelegramBot:
 
     async def group_selected(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Process selected group."""
+        session: CopySession = context.user_data["session"]
         group_name = update.message.text.strip()
-        context.user_data["group_name"] = group_name
+        session.group_name = group_name
 
         # Validate group
         await update.message.reply_text(f"⏳ Проверка группы: <code>{group_name}</code>...")
 
-        group_id = self.vk_client.get_group_id(group_name)
+        group_id = await self.vk_client.get_group_id(group_name)
         if not group_id:
             await update.message.reply_text(
                 "❌ Группа не найдена. Попробуйте ещё раз или введите /cancel для отмены.",
@@ -277,7 +420,7 @@ class VKTelegramBot:
             )
             return SELECT_GROUP
 
-        context.user_data["group_id"] = group_id
+        session.group_id = group_id
         await update.message.reply_text(
             f"✅ Группа найдена!\n\n"
             f"Теперь введите <b>начальную дату</b> (ГГГГ-ММ-ДД):\n"
@@ -288,11 +431,11 @@ class VKTelegramBot:
 
     async def start_date_selected(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Process start date."""
+        session: CopySession = context.user_data["session"]
         date_str = update.message.text.strip()
 
         try:
-            start_date = datetime.strptime(date_str, "%Y-%m-%d")
-            context.user_data["start_date"] = start_date
+            session.start_date = _parse_date(date_str)
         except ValueError:
             await update.message.reply_text(
                 "❌ Неверный формат даты. Используйте формат ГГГГ-ММ-ДД.\n"
@@ -311,11 +454,12 @@ class VKTelegramBot:
 
     async def end_date_selected(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Process end date."""
+        session: CopySession = context.user_data["session"]
         date_str = update.message.text.strip()
-        start_date = context.user_data.get("start_date")
+        start_date = session.start_date
 
         try:
-            end_date = datetime.strptime(date_str, "%Y-%m-%d")
+            end_date = _parse_date(date_str)
             # Set end_date to end of day (23:59:59)
             end_date = end_date.replace(hour=23, minute=59, second=59)
 
@@ -327,7 +471,7 @@ class VKTelegramBot:
                 )
                 return SELECT_END_DATE
 
-            context.user_data["end_date"] = end_date
+            session.end_date = end_date
         except ValueError:
             await update.message.reply_text(
                 "❌ Неверный формат даты. Используйте формат ГГГГ-ММ-ДД.",
@@ -352,37 +496,39 @@ class VKTelegramBot:
         except ValueError:
             count = 50  # Default
 
-        context.user_data["count"] = count
+        session: CopySession = context.user_data["session"]
+        session.count = count
 
-        # Start copying
-        await self.process_copy(update, context)
+        # Copy in the background and end the conversation now, so a long
+        # copy doesn't hold up other updates or restart on further text
+        context.application.create_task(self.process_copy(update, session), update=update)
 
         return ConversationHandler.END
 
-    async def process_copy(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def process_copy(self, update: Update, session: CopySession) -> None:
         """Process the actual copy operation."""
-        group_id = context.user_data["group_id"]
-        group_name = context.user_data["group_name"]
-        start_date = context.user_data["start_date"]
-        end_date = context.user_data["end_date"]
-        count = context.user_data["count"]
+        group_id = session.group_id
+        group_name = session.group_name
+        start_date = session.start_date
+        end_date = session.end_date
+        count = session.count
 
-        # Use target chat ID from file/config or current chat
+        # Use target chat ID from file/config or current chat, resolved once per job
         chat_id = self._get_target_chat_id() or str(update.effective_chat.id)
 
         await update.message.reply_text(
-            f"🚀 <b>Запуск процесса копирования...</b>\n\n"
-            f"Группа: <code>{group_name}</code>\n"
-            f"Период: <code>{start_date.strftime('%Y-%m-%d')}</code> - "
-            f"<code>{end_date.strftime('%Y-%m-%d')}</code>\n"
-            f"Постов: <code>{count}</code>\n"
-            f"Чат назначения: <code>{chat_id}</code>\n\n"
-            f"⏳ Это может занять некоторое время...",
+            COPY_STARTED_MESSAGE.format(
+                group_name=group_name,
+                start_date=start_date,
+                end_date=end_date,
+                count=count,
+                chat_id=chat_id
+            ),
             parse_mode=ParseMode.HTML
         )
 
         # Get posts from VK
-        posts = self.vk_client.get_posts(
+        posts = await self.vk_client.get_posts(
             group_id=group_id,
             start_date=start_date,
             end_date=end_date,
@@ -396,53 +542,82 @@ class VKTelegramBot:
             )
             return
 
-        # Reverse to post in chronological order
-        posts.reverse()
-
         await update.message.reply_text(
-            f"📊 Найдено <code>{len(posts)}</code> постов. Начинаю копирование...",
+            POSTS_FOUND_MESSAGE.format(total=len(posts)),
             parse_mode=ParseMode.HTML
         )
 
-        # Initialize media handler
-        self.media_handler = MediaHandler(self.bot)
+        total = len(posts)
 
-        # Copy each post
-        success_count = 0
-        for i, post in enumerate(posts, 1):
-            progress = f"({i}/{len(posts)})"
+        # Single progress message, edited periodically by one reporter task
+        progress_msg = await update.message.reply_text(f"📈 Прогресс: (0/{total})")
+        progress = CopyProgress(total=total)
+        finished = asyncio.Event()
+        reporter = asyncio.create_task(
+            self._report_progress(progress_msg, progress, finished)
+        )
 
-            try:
+        try:
+            # VK returns newest first; send oldest first, one post after
+            # another, to keep the chat in chronological order
+            for i, post in enumerate(reversed(posts), 1):
                 media = self.vk_client.get_post_media(post)
+                copied = await self._copy_post(chat_id, i, media)
+                progress.done += 1
+                if copied:
+                    progress.copied += 1
+        finally:
+            finished.set()
+            await reporter
 
-                # Create caption
-                caption = None
-                if media["text"]:
-                    caption = media["text"][:1000]  # Telegram caption limit
+        await update.message.reply_text(
+            COPY_DONE_MESSAGE.format(success_count=progress.copied, total=total),
+            parse_mode=ParseMode.HTML
+        )
 
+    async def _copy_post(self, chat_id: str, i: int, media: dict) -> bool:
+        """Send one prepared VK post to the chat. Returns True if anything was sent."""
+        async with self._chat_locks[chat_id], self._copy_semaphore:
+            try:
                 # Send media
-                if await self.media_handler.send_message_with_media(
+                return await self.media_handler.send_message_with_media(
                     chat_id=chat_id,
                     media=media,
-                    caption=caption
-                ):
-                    success_count += 1
+                    caption=media["caption"]
+                )
+            except TelegramError as e:
+                logger.error("Error copying post %d: %s", i, e)
+                return False
+
+    async def _report_progress(
+        self,
+        progress_msg: Message,
+        progress: CopyProgress,
+        finished: asyncio.Event
+    ) -> None:
+        """Edit the progress message every few seconds until the copy finishes."""
+        last_text = None
+
+        while True:
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=Config.PROGRESS_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
 
-                # Progress update every 10 posts
-                if i % 10 == 0 or i == len(posts):
-                    await update.message.reply_text(
-                        f"📈 Прогресс: {progress} - скопировано {success_count}/{i} постов"
-                    )
+            text = (
+                f"📈 Прогресс: ({progress.done}/{progress.total}) - "
+                f"скопировано {progress.copied}/{progress.done} постов"
+            )
+            if text != last_text:
+                try:
+                    await progress_msg.edit_text(text)
+                    last_text = text
+                except TelegramError as e:
+                    # Flood control or network trouble: try again next tick
+                    logger.warning("Progress update skipped: %s", e)
 
-            except Exception as e:
-                logger.error(f"Error copying post {i}: {e}")
-                continue
-
-        await update.message.reply_text(
-            f"✅ <b>Копирование завершено!</b>\n\n"
-            f"Успешно скопировано: <code>{success_count}/{len(posts)}</code> постов",
-            parse_mode=ParseMode.HTML
-        )
+            if finished.is_set():
+                return
 
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Cancel the current operation."""
@@ -454,11 +629,12 @@ class VKTelegramBot:
 
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle errors."""
-        logger.error(f"Update {update} caused error: {context.error}")
+        logger.error("Update %s caused error: %s", update, context.error)
 
         if update and update.effective_message:
+            error_text = html.escape(str(context.error)[:500])
             await update.effective_message.reply_text(
-                f"❌ Произошла ошибка: <code>{context.error}</code>",
+                f"❌ Произошла ошибка: <code>{error_text}</code>",
                 parse_mode=ParseMode.HTML
             )
     
@@ -467,18 +643,31 @@ class VKTelegramBot:
         # Validate config
         Config.validate()
 
+        # Use uvloop's faster event loop when it is available
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
         # Create application
-        application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(Config.TELEGRAM_BOT_TOKEN)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
         self.bot = application.bot
+        self.media_handler = MediaHandler(self.bot, self.store)
 
         # Add conversation handler for copy
         conv_handler = ConversationHandler(
             entry_points=[CommandHandler("copy", self.copy_start)],
             states={
-                SELECT_GROUP: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.group_selected)],
-                SELECT_START_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.start_date_selected)],
-                SELECT_END_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.end_date_selected)],
-                SELECT_COUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.count_selected)],
+                SELECT_GROUP: [MessageHandler(TEXT_INPUT, self.group_selected)],
+                SELECT_START_DATE: [MessageHandler(TEXT_INPUT, self.start_date_selected)],
+                SELECT_END_DATE: [MessageHandler(TEXT_INPUT, self.end_date_selected)],
+                SELECT_COUNT: [MessageHandler(TEXT_INPUT, self.count_selected)],
             },
             fallbacks=[CommandHandler("cancel", self.cancel)],
         )
@@ -487,7 +676,7 @@ class VKTelegramBot:
         setchat_handler = ConversationHandler(
             entry_points=[CommandHandler("setchat", self.set_chat)],
             states={
-                SETCHAT_WAIT_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.receive_chat_id)],
+                SETCHAT_WAIT_ID: [MessageHandler(TEXT_INPUT, self.receive_chat_id)],
             },
             fallbacks=[CommandHandler("cancel", self.cancel_setchat)],
         )
@@ -515,7 +704,11 @@ class VKTelegramBot:
 def main():
     """Main entry point."""
     bot = VKTelegramBot()
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        # Flush queued log records before exit
+        log_listener.stop()
 
 
 if __name__ == "__main__":
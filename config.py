@@ -4,6 +4,7 @@ Loads settings from environment variables.
 """
 
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,7 +16,7 @@ class Config:
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     VK_ACCESS_TOKEN: str = os.getenv("VK_ACCESS_TOKEN", "")
     VK_API_VERSION: str = os.getenv("VK_API_VERSION", "5.131")
-    TARGET_CHAT_ID: str = os.getenv("TARGET_CHAT_ID", "")
+    TARGET_CHAT_ID: Optional[str] = os.getenv("TARGET_CHAT_ID") or None
     
     # VK API base URL
     VK_API_URL: str = "https://api.vk.com/method"
@@ -26,9 +27,61 @@ class Config:
     # Max posts per request
     MAX_POSTS_COUNT: int = 100
     
+    # Attempts per VK request on 5xx responses, and the first retry delay
+    # (seconds), doubled on each further attempt
+    VK_MAX_TRIES: int = 3
+    VK_RETRY_BACKOFF: float = 0.3
+    
+    # wall.get pages fetched in one execute call when scanning back to
+    # the requested dates (VK allows up to 25 calls per execute)
+    VK_EXECUTE_PAGES: int = 5
+    
+    # Telegram text message and media caption limits
+    MESSAGE_MAX_LENGTH: int = 4096
+    CAPTION_MAX_LENGTH: int = 1024
+    
+    # Delay before writing target chat changes to disk (seconds)
+    CHAT_SAVE_DELAY: float = 0.5
+    
     # File download chunk size
     CHUNK_SIZE: int = 8192
     
+    # Telegram bot upload limit (bytes)
+    MAX_FILE_SIZE: int = 50 * 1024 * 1024
+    
+    # Telegram send rate limits: messages per second overall, and per chat
+    # *_RATE_LIMIT messages per *_RATE_PERIOD seconds; groups and channels
+    # (negative chat IDs) are limited far more strictly than private chats
+    GLOBAL_RATE_LIMIT: int = 25
+    GROUP_CHAT_RATE_LIMIT: int = 20
+    GROUP_CHAT_RATE_PERIOD: int = 60
+    PRIVATE_CHAT_RATE_LIMIT: int = 1
+    PRIVATE_CHAT_RATE_PERIOD: int = 1
+    
+    # Attempts per Telegram send on flood control or network errors
+    SEND_MAX_TRIES: int = 5
+    
+    # Uploaded media file_id cache: max entries and lifetime (seconds)
+    FILE_ID_CACHE_SIZE: int = 2048
+    FILE_ID_CACHE_TTL: int = 3600
+    
+    # Max posts sent concurrently across all copy jobs (one per target chat)
+    COPY_CONCURRENCY: int = 8
+    
+    # Seconds between progress message updates during a copy
+    PROGRESS_INTERVAL: float = 3.0
+    
+    # Resolved VK group ID cache: max entries and lifetime (seconds)
+    GROUP_ID_CACHE_SIZE: int = 1024
+    GROUP_ID_CACHE_TTL: int = 86400
+    
+    # Best photo size cache: max entries
+    PHOTO_CACHE_SIZE: int = 512
+    
+    # Persistent cache of file_ids and group IDs, kept across restarts
+    CACHE_DB_FILE: str = "cache.sqlite3"
+    FILE_ID_STORE_TTL: int = 30 * 86400
+    
     @classmethod
     def validate(cls) -> bool:
         """Validate required configuration."""
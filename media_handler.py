@@ -2,12 +2,20 @@
 Media handler for downloading and uploading files to Telegram.
 """
 
+import asyncio
 import logging
+import random
 import aiohttp
-import io
-from typing import Optional, List
+from typing import Optional, List, Union
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
 from telegram import Bot, InputMediaPhoto
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from config import Config
+from store import CacheStore
+from vk_client import PhotoMedia, VideoMedia, DocumentMedia, LinkMedia
 
 logger = logging.getLogger(__name__)
 
@@ -15,32 +23,192 @@ logger = logging.getLogger(__name__)
 class MediaHandler:
     """Handles media download and upload operations."""
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, store: Optional[CacheStore] = None):
         self.bot = bot
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Downloads in progress, keyed by URL, shared by concurrent callers
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Pace sends below Telegram's flood limits instead of hitting 429s
+        self._global_limiter = AsyncLimiter(Config.GLOBAL_RATE_LIMIT, 1)
+        self._chat_limiters: dict[str, AsyncLimiter] = {}
+        # Telegram file_id of media already uploaded, keyed by source URL
+        self._file_id_cache: TTLCache = TTLCache(
+            maxsize=Config.FILE_ID_CACHE_SIZE,
+            ttl=Config.FILE_ID_CACHE_TTL
+        )
+        # Persistent file_id cache, so uploads survive restarts
+        self.store = store
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=32,
+                limit_per_host=8,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
 
     async def download_file(self, url: str) -> Optional[bytes]:
-        """Download file from URL."""
+        """
+        Download file from URL.
+        Concurrent requests for the same URL share a single download.
+        """
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._download(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+
+        # Shield so one cancelled caller does not cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        """
+        Fetch file body from URL.
+        Files over Telegram's upload limit are skipped without reading them fully.
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=30) as response:
-                    response.raise_for_status()
-                    return await response.read()
+            session = await self._get_session()
+            async with session.get(url) as response:
+                response.raise_for_status()
+
+                size = response.content_length
+                if size and size > Config.MAX_FILE_SIZE:
+                    logger.warning("Skipping %s: %s bytes exceeds upload limit", url, size)
+                    return None
+
+                buffer = bytearray()
+                async for chunk in response.content.iter_chunked(Config.CHUNK_SIZE):
+                    buffer += chunk
+                    if len(buffer) > Config.MAX_FILE_SIZE:
+                        logger.warning("Skipping %s: exceeds upload limit", url)
+                        return None
+                return bytes(buffer)
         except aiohttp.ClientError as e:
-            logger.error(f"Failed to download {url}: {e}")
+            logger.error("Failed to download %s: %s", url, e)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error downloading {url}: {e}")
+            logger.error("Unexpected error downloading %s: %s", url, e)
             return None
 
+    def _chat_limiter(self, chat_id: str) -> AsyncLimiter:
+        """Get the rate limiter for a chat, by chat type."""
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            if str(chat_id).startswith("-"):
+                limiter = AsyncLimiter(
+                    Config.GROUP_CHAT_RATE_LIMIT,
+                    Config.GROUP_CHAT_RATE_PERIOD
+                )
+            else:
+                limiter = AsyncLimiter(
+                    Config.PRIVATE_CHAT_RATE_LIMIT,
+                    Config.PRIVATE_CHAT_RATE_PERIOD
+                )
+            self._chat_limiters[chat_id] = limiter
+        return limiter
+
+    async def _rate_limited_call(self, chat_id: str, method, *args, weight: int = 1, **kwargs):
+        """
+        Call a Bot send method within the global and per-chat rate limits.
+        A media group counts as one message per item.
+
+        Flood control (RetryAfter) waits exactly as long as Telegram asks;
+        timeouts and network errors are retried with exponential backoff.
+        """
+        for attempt in range(1, Config.SEND_MAX_TRIES + 1):
+            await self._global_limiter.acquire(weight)
+            chat_limiter = self._chat_limiter(chat_id)
+            # A private chat's limiter holds a single message; an album
+            # can't take more than the whole capacity
+            await chat_limiter.acquire(min(weight, chat_limiter.max_rate))
+            try:
+                return await method(*args, chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                if attempt == Config.SEND_MAX_TRIES:
+                    raise
+                delay = e.retry_after + random.uniform(0.25, 1.0)
+                logger.warning("Flood control, retrying in %.1fs", delay)
+            except BadRequest:
+                # BadRequest subclasses NetworkError but will never succeed on retry
+                raise
+            except NetworkError as e:
+                if attempt == Config.SEND_MAX_TRIES:
+                    raise
+                delay = min(2 ** attempt, 30)
+                logger.warning("Network error (%s), retrying in %ds", e, delay)
+            await asyncio.sleep(delay)
+
+    def _store_key(self, url: str) -> str:
+        """Persistent cache key; file_ids are only valid for the bot that made them."""
+        return f"file_id:{self.bot.id}:{url}"
+
+    async def _get_file_id(self, url: str) -> Optional[str]:
+        """Get the Telegram file_id of media already uploaded from the URL."""
+        file_id = self._file_id_cache.get(url)
+        if file_id is None and self.store:
+            file_id = await self.store.get(self._store_key(url))
+            if file_id:
+                self._file_id_cache[url] = file_id
+        return file_id
+
+    async def _remember_file_id(self, url: str, file_id: str) -> None:
+        """Cache the file_id Telegram assigned to media uploaded from the URL."""
+        self._file_id_cache[url] = file_id
+        if self.store:
+            await self.store.put(self._store_key(url), file_id, Config.FILE_ID_STORE_TTL)
+
+    async def _forget_file_id(self, url: str) -> None:
+        """Drop a cached file_id that Telegram no longer accepts."""
+        self._file_id_cache.pop(url, None)
+        if self.store:
+            await self.store.delete(self._store_key(url))
+
+    async def _send_album(
+        self,
+        chat_id: str,
+        photos: List[Union[str, bytes]],
+        caption: Optional[str] = None
+    ) -> tuple:
+        """Send photos (URLs, file_ids or bytes) as one album; caption goes on the first."""
+        media_list = [
+            InputMediaPhoto(
+                media=photo,
+                caption=caption if j == 0 else None,
+                parse_mode=ParseMode.HTML if caption and j == 0 else None
+            )
+            for j, photo in enumerate(photos)
+        ]
+        return await self._rate_limited_call(
+            chat_id,
+            self.bot.send_media_group,
+            media=media_list,
+            weight=len(media_list)
+        )
+
     async def send_media_group(
         self,
         chat_id: str,
-        photos: List[dict],
+        photos: List[PhotoMedia],
         caption: Optional[str] = None
     ) -> bool:
         """
         Send multiple photos as a single media group (album).
         Telegram allows up to 10 photos in one album.
+
+        Telegram fetches the photos by URL itself; they are only downloaded
+        and uploaded by the bot if Telegram cannot fetch them.
         """
         try:
             if not photos:
@@ -53,99 +221,156 @@ class MediaHandler:
 
             for i in range(0, len(photos), chunk_size):
                 photo_chunk = photos[i:i + chunk_size]
-                media_list = []
+                urls = [photo.url for photo in photo_chunk]
+                urls = [url for url in urls if url]
+                if not urls:
+                    continue
 
-                for j, photo_data in enumerate(photo_chunk):
-                    url = photo_data.get("url")
-                    if not url:
-                        continue
-
-                    photo_bytes = await self.download_file(url)
-                    if not photo_bytes:
-                        continue
+                # First photo of the album gets the caption
+                album_caption = caption if i == 0 else None
 
-                    # First photo gets the caption
-                    photo_caption = caption if j == 0 and i == 0 else None
+                try:
+                    sent_urls = urls
+                    messages = await self._send_album(
+                        chat_id,
+                        [await self._get_file_id(url) or url for url in urls],
+                        album_caption
+                    )
+                except BadRequest as e:
+                    logger.info("Telegram could not fetch album by URL (%s), uploading files", e)
 
-                    input_media = InputMediaPhoto(
-                        media=io.BytesIO(photo_bytes),
-                        caption=photo_caption,
-                        parse_mode=ParseMode.HTML if photo_caption else None
+                    # Download the whole chunk concurrently
+                    downloads = await asyncio.gather(
+                        *(self.download_file(url) for url in urls),
+                        return_exceptions=True
                     )
-                    media_list.append(input_media)
+                    fetched = [
+                        (url, photo_bytes)
+                        for url, photo_bytes in zip(urls, downloads)
+                        if photo_bytes and not isinstance(photo_bytes, BaseException)
+                    ]
+                    if not fetched:
+                        continue
 
-                if media_list:
-                    await self.bot.send_media_group(
-                        chat_id=chat_id,
-                        media=media_list
+                    sent_urls = [url for url, _ in fetched]
+                    messages = await self._send_album(
+                        chat_id,
+                        [photo_bytes for _, photo_bytes in fetched],
+                        album_caption
                     )
 
+                for url, message in zip(sent_urls, messages):
+                    if message.photo:
+                        await self._remember_file_id(url, message.photo[-1].file_id)
+
             return all_success
         except Exception as e:
-            logger.error(f"Failed to send media group: {e}")
+            logger.error("Failed to send media group: %s", e)
             return False
 
-    async def send_photo(
+    async def _send_photo_url(
         self,
         chat_id: str,
-        photo_data: dict,
+        url: str,
         caption: Optional[str] = None
     ) -> bool:
-        """Send single photo to Telegram chat."""
+        """
+        Send photo by URL so Telegram fetches it itself.
+        Falls back to downloading and uploading it if Telegram cannot fetch the URL.
+        """
         try:
-            url = photo_data.get("url")
-            if not url:
-                return False
-
+            message = await self._rate_limited_call(
+                chat_id,
+                self.bot.send_photo,
+                photo=await self._get_file_id(url) or url,
+                caption=caption,
+                parse_mode=ParseMode.HTML
+            )
+        except BadRequest as e:
+            logger.info("Telegram could not fetch %s (%s), uploading file", url, e)
             photo_bytes = await self.download_file(url)
             if not photo_bytes:
                 return False
 
-            await self.bot.send_photo(
-                chat_id=chat_id,
-                photo=io.BytesIO(photo_bytes),
+            message = await self._rate_limited_call(
+                chat_id,
+                self.bot.send_photo,
+                photo=photo_bytes,
                 caption=caption,
                 parse_mode=ParseMode.HTML
             )
-            return True
+
+        await self._remember_file_id(url, message.photo[-1].file_id)
+        return True
+
+    async def send_photo(
+        self,
+        chat_id: str,
+        photo_data: PhotoMedia,
+        caption: Optional[str] = None
+    ) -> bool:
+        """Send single photo to Telegram chat."""
+        try:
+            url = photo_data.url
+            if not url:
+                return False
+
+            return await self._send_photo_url(chat_id, url, caption)
         except Exception as e:
-            logger.error(f"Failed to send photo: {e}")
+            logger.error("Failed to send photo: %s", e)
             return False
 
     async def send_document(
         self,
         chat_id: str,
-        doc_data: dict,
+        doc_data: DocumentMedia,
         caption: Optional[str] = None
     ) -> bool:
         """Send document to Telegram chat."""
         try:
-            url = doc_data.get("url")
+            url = doc_data.url
             if not url:
                 return False
 
-            doc_bytes = await self.download_file(url)
-            if not doc_bytes:
-                return False
+            filename = doc_data.title or f"file.{doc_data.ext or 'bin'}"
 
-            filename = doc_data.get("title", f"file.{doc_data.get('ext', 'bin')}")
+            async def send(document: Union[str, bytes]):
+                return await self._rate_limited_call(
+                    chat_id,
+                    self.bot.send_document,
+                    document=document,
+                    filename=filename,
+                    caption=caption,
+                    parse_mode=ParseMode.HTML
+                )
 
-            await self.bot.send_document(
-                chat_id=chat_id,
-                document=io.BytesIO(doc_bytes),
-                filename=filename,
-                caption=caption,
-                parse_mode=ParseMode.HTML
-            )
+            file_id = await self._get_file_id(url)
+            if file_id:
+                try:
+                    message = await send(file_id)
+                except BadRequest as e:
+                    # Stale file_id (another bot, or dropped by Telegram):
+                    # forget it and upload the file again
+                    logger.info("Cached file_id for %s rejected (%s), uploading file", url, e)
+                    await self._forget_file_id(url)
+                    file_id = None
+
+            if not file_id:
+                document = await self.download_file(url)
+                if not document:
+                    return False
+                message = await send(document)
+
+            await self._remember_file_id(url, message.document.file_id)
             return True
         except Exception as e:
-            logger.error(f"Failed to send document: {e}")
+            logger.error("Failed to send document: %s", e)
             return False
 
     async def send_video(
         self,
         chat_id: str,
-        video_data: dict,
+        video_data: VideoMedia,
         caption: Optional[str] = None
     ) -> bool:
         """
@@ -153,35 +378,29 @@ class MediaHandler:
         Note: VK videos often require special handling.
         """
         try:
-            title = video_data.get("title", "Video")
-            description = video_data.get("description", "")
+            title = video_data.title
+            description = video_data.description
 
             caption_text = f"🎬 <b>{title}</b>\n"
             if description:
                 caption_text += f"<i>{description[:500]}</i>"
 
             # Try to get video thumbnail
-            image_url = video_data.get("image")
+            image_url = video_data.image
             if image_url:
-                image_bytes = await self.download_file(image_url)
-                if image_bytes:
-                    await self.bot.send_photo(
-                        chat_id=chat_id,
-                        photo=io.BytesIO(image_bytes),
-                        caption=caption_text,
-                        parse_mode=ParseMode.HTML
-                    )
+                if await self._send_photo_url(chat_id, image_url, caption_text):
                     return True
 
             # Fallback: send text with video info
-            await self.bot.send_message(
-                chat_id=chat_id,
+            await self._rate_limited_call(
+                chat_id,
+                self.bot.send_message,
                 text=caption_text,
                 parse_mode=ParseMode.HTML
             )
             return True
         except Exception as e:
-            logger.error(f"Failed to send video: {e}")
+            logger.error("Failed to send video: %s", e)
             return False
 
     async def send_message_with_media(
@@ -204,29 +423,47 @@ class MediaHandler:
         """
         success = False
 
+        # All links go out as one HTML block instead of a message per link
+        links_html = "\n".join(self._format_link(link) for link in media["links"])
+
         # Send text if no media
         if not media["photos"] and not media["videos"] and not media["documents"]:
-            if media["text"]:
+            text = media["text"]
+
+            # Fold links into the same message when they fit
+            if links_html and len(text) + len(links_html) + 2 <= Config.MESSAGE_MAX_LENGTH:
+                text = f"{text}\n\n{links_html}" if text else links_html
+                links_html = ""
+
+            if text:
                 try:
-                    await self.bot.send_message(
-                        chat_id=chat_id,
-                        text=media["text"],
+                    await self._rate_limited_call(
+                        chat_id,
+                        self.bot.send_message,
+                        text=text,
                         parse_mode=ParseMode.HTML
                     )
-                    return True
+                    success = True
                 except Exception as e:
-                    logger.error(f"Failed to send message: {e}")
+                    logger.error("Failed to send message: %s", e)
                     return False
 
         # Send photos as album if multiple, or single photo
         if media["photos"]:
+            photo_caption = caption
+
+            # Fold links into the photo caption when they fit
+            if links_html and len(caption or "") + len(links_html) + 2 <= Config.CAPTION_MAX_LENGTH:
+                photo_caption = f"{caption}\n\n{links_html}" if caption else links_html
+                links_html = ""
+
             if len(media["photos"]) > 1:
                 # Send as album
-                if await self.send_media_group(chat_id, media["photos"], caption):
+                if await self.send_media_group(chat_id, media["photos"], photo_caption):
                     success = True
             else:
                 # Send single photo
-                if await self.send_photo(chat_id, media["photos"][0], caption):
+                if await self.send_photo(chat_id, media["photos"][0], photo_caption):
                     success = True
 
         # Send videos
@@ -239,19 +476,25 @@ class MediaHandler:
             if await self.send_document(chat_id, doc, caption):
                 success = True
 
-        # Send links
-        for link in media["links"]:
-            link_text = f"🔗 <a href=\"{link['url']}\">{link['title']}</a>"
-            if link.get("description"):
-                link_text += f"\n<i>{link['description'][:200]}</i>"
+        # Send remaining links as a single message
+        if links_html:
             try:
-                await self.bot.send_message(
-                    chat_id=chat_id,
-                    text=link_text,
+                await self._rate_limited_call(
+                    chat_id,
+                    self.bot.send_message,
+                    text=links_html,
                     parse_mode=ParseMode.HTML
                 )
                 success = True
             except Exception as e:
-                logger.error(f"Failed to send link: {e}")
+                logger.error("Failed to send links: %s", e)
 
         return success
+
+    @staticmethod
+    def _format_link(link: LinkMedia) -> str:
+        """Format link attachment as an HTML snippet."""
+        link_text = f"🔗 <a href=\"{link.url}\">{link.title}</a>"
+        if link.description:
+            link_text += f"\n<i>{link.description[:200]}</i>"
+        return link_text
@@ -0,0 +1,91 @@
+"""
+Persistent key-value cache backed by SQLite.
+Keeps uploaded file_ids and resolved group IDs across restarts.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+CacheValue = Union[str, int]
+
+
+class CacheStore:
+    """SQLite cache with per-entry expiry; queries run in worker threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # One connection shared by worker threads, used one at a time
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use and drop expired entries."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(k TEXT PRIMARY KEY, v BLOB, exp INTEGER)"
+            )
+            conn.execute("DELETE FROM cache WHERE exp <= ?", (int(time.time()),))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[CacheValue]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT v FROM cache WHERE k = ? AND exp > ?",
+                (key, int(time.time()))
+            ).fetchone()
+        return row[0] if row else None
+
+    def _put(self, key: str, value: CacheValue, ttl: int) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (k, v, exp) VALUES (?, ?, ?)",
+                (key, value, int(time.time()) + ttl)
+            )
+            conn.commit()
+
+    async def get(self, key: str) -> Optional[CacheValue]:
+        """Get a cached value, or None if missing or expired."""
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            logger.warning("Cache read failed for %s: %s", key, e)
+            return None
+
+    async def put(self, key: str, value: CacheValue, ttl: int) -> None:
+        """Store a value for ttl seconds."""
+        try:
+            await asyncio.to_thread(self._put, key, value, ttl)
+        except sqlite3.Error as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE k = ?", (key,))
+            conn.commit()
+
+    async def delete(self, key: str) -> None:
+        """Remove a value, if present."""
+        try:
+            await asyncio.to_thread(self._delete, key)
+        except sqlite3.Error as e:
+            logger.warning("Cache delete failed for %s: %s", key, e)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
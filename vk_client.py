@@ -2,98 +2,455 @@
 VK API client for fetching posts with media attachments.
 """
 
+import asyncio
+import json
 import logging
-import requests
+import aiohttp
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Optional
 from datetime import datetime
+from cachetools import TTLCache
 from config import Config
+from store import CacheStore
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 logger = logging.getLogger(__name__)
 
+# Sent once per session instead of aiohttp's default
+USER_AGENT = "telegram-vk-bot (aiohttp)"
+
+# Transient VK server errors worth retrying
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+# wall.get request variants, tried in order until one gets a response:
+# (description, extra params, use_token)
+WALL_VARIANTS = (
+    ("without token", {}, False),
+    ("with token", {}, True),
+    ("with extended=1", {"extended": 1}, False),
+    (
+        "with full params and token",
+        {"extended": 1, "attachments": "photo,video,doc,link,note,poll,article"},
+        True
+    ),
+)
+
+
+@dataclass(slots=True, frozen=True)
+class PhotoMedia:
+    """Photo attachment, at its largest available size. Shared between posts."""
+
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+@dataclass(slots=True)
+class VideoMedia:
+    """Video attachment."""
+
+    title: str = "Video"
+    description: str = ""
+    player: Optional[str] = None
+    # URL of the largest preview image
+    image: Optional[str] = None
+    duration: int = 0
+    owner_id: Optional[int] = None
+    id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class DocumentMedia:
+    """Document attachment."""
+
+    title: str = "Document"
+    url: Optional[str] = None
+    size: int = 0
+    ext: str = ""
+
+
+@dataclass(slots=True)
+class LinkMedia:
+    """Link attachment."""
+
+    title: str = ""
+    url: str = ""
+    description: str = ""
+    photo: dict = field(default_factory=dict)
+
+
+# Best size of recently seen photos, keyed by (owner_id, photo id), LRU
+_best_photos: OrderedDict[tuple, Optional[PhotoMedia]] = OrderedDict()
+
+
+def _neg_date(post: dict) -> int:
+    """Key turning VK's newest-first wall order into ascending order."""
+    return -post["date"]
+
+
+def _photo_area(size: dict) -> int:
+    """Pixel area of a VK photo size entry."""
+    return size.get("width", 0) * size.get("height", 0)
+
+
+def _best_photo(photo: dict) -> Optional[PhotoMedia]:
+    """Pick the highest resolution version of a VK photo."""
+    sizes = photo.get("sizes", [])
+    if sizes:
+        # Pick the largest without sorting (or mutating) the post
+        best = max(sizes, key=_photo_area)
+        return PhotoMedia(
+            url=best.get("url"),
+            width=best.get("width"),
+            height=best.get("height")
+        )
+    for key in ("photo_1280", "photo_807", "photo_604"):
+        if key in photo:
+            return PhotoMedia(url=photo[key])
+    return None
+
+
+def _add_photo(attachment: dict, media: dict) -> None:
+    """Add the largest available size of a photo attachment."""
+    photo = attachment.get("photo", {})
+    photo_id = photo.get("id")
+    if photo_id is None:
+        best = _best_photo(photo)
+    else:
+        # Reshared photos are looked up instead of recomputed
+        key = (photo.get("owner_id"), photo_id)
+        if key in _best_photos:
+            best = _best_photos[key]
+            _best_photos.move_to_end(key)
+        else:
+            best = _best_photo(photo)
+            _best_photos[key] = best
+            if len(_best_photos) > Config.PHOTO_CACHE_SIZE:
+                _best_photos.popitem(last=False)
+
+    if best:
+        media["photos"].append(best)
+
+
+def _image_width(image: dict) -> int:
+    """Width of a VK video preview image entry."""
+    return image.get("width", 0)
+
+
+def _add_video(attachment: dict, media: dict) -> None:
+    """Add a video attachment."""
+    video = attachment.get("video", {})
+    # VK lists preview images as {url, width, height} entries
+    images = video.get("image") or []
+    image = max(images, key=_image_width).get("url") if images else None
+    media["videos"].append(VideoMedia(
+        title=video.get("title", "Video"),
+        description=video.get("description", ""),
+        player=video.get("player"),
+        image=image,
+        duration=video.get("duration", 0),
+        owner_id=video.get("owner_id"),
+        id=video.get("id")
+    ))
+
+
+def _add_document(attachment: dict, media: dict) -> None:
+    """Add a document attachment."""
+    doc = attachment.get("doc", {})
+    media["documents"].append(DocumentMedia(
+        title=doc.get("title", "Document"),
+        url=doc.get("url"),
+        size=doc.get("size", 0),
+        ext=doc.get("ext", "")
+    ))
+
+
+def _add_link(attachment: dict, media: dict) -> None:
+    """Add a link attachment."""
+    link = attachment.get("link", {})
+    media["links"].append(LinkMedia(
+        title=link.get("title", ""),
+        url=link.get("url", ""),
+        description=link.get("description", ""),
+        photo=link.get("photo", {})
+    ))
+
+
+# Attachment type -> function adding it to the media dict
+_ATTACHMENT_HANDLERS = {
+    "photo": _add_photo,
+    "video": _add_video,
+    "doc": _add_document,
+    "link": _add_link,
+}
+
 
 class VKClient:
     """Client for VK API interactions."""
     
-    def __init__(self):
+    def __init__(self, store: Optional[CacheStore] = None):
         self.token = Config.VK_ACCESS_TOKEN
         self.version = Config.VK_API_VERSION
         self.base_url = Config.VK_API_URL
+        # Endpoint URLs and version/token params, built once
+        self._method_urls = {
+            method: f"{self.base_url}/{method}"
+            for method in ("wall.get", "groups.getById", "execute")
+        }
+        self._base_params = {"v": self.version}
+        self._token_params = {"v": self.version, "access_token": self.token}
+        # Resolved group IDs keyed by normalized group name
+        self._group_id_cache: TTLCache = TTLCache(
+            maxsize=Config.GROUP_ID_CACHE_SIZE,
+            ttl=Config.GROUP_ID_CACHE_TTL
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Persistent cache backing the in-memory one across restarts
+        self.store = store
+        # Index of the wall.get variant that last worked, keyed by owner_id
+        self._wall_variant: dict[str, int] = {}
     
-    def _make_request(self, method: str, params: dict, use_token: bool = True) -> Optional[dict]:
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            # Keep connections to api.vk.com alive between pages and probes
+            connector = aiohttp.TCPConnector(
+                limit_per_host=16,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT)
+            )
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+    
+    async def _make_request(self, method: str, params: dict, use_token: bool = True) -> Optional[dict]:
         """Make request to VK API."""
-        url = f"{self.base_url}/{method}"
-        if use_token:
-            params.update({
-                "access_token": self.token,
-                "v": self.version
-            })
-        else:
-            params["v"] = self.version
+        url = self._method_urls.get(method) or f"{self.base_url}/{method}"
+        # Leave the caller's params untouched
+        request_params = {**(self._token_params if use_token else self._base_params), **params}
 
         try:
-            response = requests.get(url, params=params, timeout=Config.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            data = response.json()
+            session = await self._get_session()
+            for attempt in range(1, Config.VK_MAX_TRIES + 1):
+                async with session.get(url, params=request_params) as response:
+                    if response.status not in RETRY_STATUSES or attempt == Config.VK_MAX_TRIES:
+                        response.raise_for_status()
+                        data = _json_loads(await response.read())
+                        break
+
+                delay = Config.VK_RETRY_BACKOFF * 2 ** (attempt - 1)
+                logger.warning("VK API returned %s, retrying in %.1fs", response.status, delay)
+                await asyncio.sleep(delay)
 
             if "error" in data:
                 error_msg = data['error'].get('error_msg', 'Unknown error')
                 error_code = data['error'].get('error_code', 'Unknown')
-                logger.error(f"VK API error [{error_code}]: {error_msg}")
-                logger.error(f"Request: {method}, Params: {params}")
+                logger.error("VK API error [%s]: %s", error_code, error_msg)
+                logger.error("Request: %s, Params: %s", method, params)
                 return None
 
             return data.get("response")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Request failed: %r", e)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            logger.error("Unexpected error: %s", e)
             return None
+
+    async def _get_wall(self, params: dict, use_token: bool = True) -> Optional[dict]:
+        """Call wall.get."""
+        return await self._make_request("wall.get", params, use_token=use_token)
+
+    async def _get_group_by_id(self, group_id: str) -> Optional[dict]:
+        """Call groups.getById for one group."""
+        return await self._make_request("groups.getById", {"group_id": group_id})
     
-    def get_group_id(self, group_name: str) -> Optional[int]:
-        """Get group ID by group name/screen name."""
+    async def get_group_id(self, group_name: str) -> Optional[int]:
+        """
+        Get group ID by group name/screen name.
+        Successful lookups are cached in memory and in the persistent store,
+        so repeat copies skip the VK API, even after a restart.
+        """
         group_name = group_name.strip()
         
         # If it's already a numeric ID, return it
         if group_name.isdigit():
             return int(group_name)
         
-        # Try different formats for screen names
+        cache_key = group_name.lower().lstrip('@')
+        group_id = self._group_id_cache.get(cache_key)
+        if group_id is not None:
+            return group_id
+
+        store_key = f"group_id:{cache_key}"
+        if self.store:
+            group_id = await self.store.get(store_key)
+
+        if group_id is None:
+            group_id = await self._resolve_group_id(group_name)
+            if group_id and self.store:
+                await self.store.put(store_key, group_id, Config.GROUP_ID_CACHE_TTL)
+
+        if group_id:
+            self._group_id_cache[cache_key] = group_id
+        return group_id
+    
+    async def _resolve_group_id(self, group_name: str) -> Optional[int]:
+        """Resolve group ID via the VK API."""
+        # Try different formats for screen names. Numeric IDs never get
+        # here, so "club{id}" / "public{id}" variants would never match
         variants = [
             group_name,           # e.g., "durov"
-            f"club{group_name}",  # e.g., "club123456" for groups
-            f"public{group_name}", # e.g., "public123456" for pages
             f"@{group_name}",     # e.g., "@durov"
         ]
         
-        for variant in variants:
-            params = {"group_id": variant}
-            result = self._make_request("groups.getById", params)
-            if result and result.get("groups"):
-                group_id = result["groups"][0]["id"]
-                logger.info(f"Found group ID {group_id} for '{group_name}'")
-                return group_id
+        # Probe all variants at once; the first one to match wins and the
+        # probes still in flight are cancelled
+        probes = [
+            asyncio.create_task(self._get_group_by_id(variant))
+            for variant in variants
+        ]
+        try:
+            for probe in asyncio.as_completed(probes):
+                result = await probe
+                if result and result.get("groups"):
+                    group_id = result["groups"][0]["id"]
+                    logger.info("Found group ID %s for '%s'", group_id, group_name)
+                    return group_id
+        finally:
+            for probe in probes:
+                probe.cancel()
         
         # Try using wall.get directly to check if the group exists
         # This works for some cases where groups.getById fails
-        logger.warning(f"groups.getById failed, trying wall.get fallback for '{group_name}'")
+        logger.warning("groups.getById failed, trying wall.get fallback for '%s'", group_name)
         
         # Try with screen name directly in wall.get
         test_params = {
             "owner_id": group_name,
             "count": 1
         }
-        result = self._make_request("wall.get", test_params)
+        result = await self._get_wall(test_params)
         if result:
             # Extract owner_id from the response
             # For groups, owner_id is negative
-            logger.info(f"wall.get succeeded for '{group_name}', using as-is")
+            logger.info("wall.get succeeded for '%s', using as-is", group_name)
             return group_name  # Return as string, will be handled in get_posts
         
-        logger.error(f"Could not find group: {group_name}")
+        logger.error("Could not find group: %s", group_name)
         return None
     
-    def get_posts(
+    def _wall_ladder(self, owner_id: str, group_id: int | str) -> list[tuple[str, dict, bool]]:
+        """Build the wall.get variants to try for an owner, in order."""
+        ladder = [
+            (description, {"owner_id": owner_id, **extra}, use_token)
+            for description, extra, use_token in WALL_VARIANTS
+        ]
+        # Try without the minus prefix (for pages/public pages)
+        if owner_id.startswith('-') and isinstance(group_id, str):
+            ladder.append(("without minus prefix", {"owner_id": group_id}, False))
+            ladder.append(("without minus prefix, with token", {"owner_id": group_id}, True))
+        return ladder
+
+    async def _fetch_page(
+        self,
+        owner_id: str,
+        group_id: int | str,
+        offset: int,
+        batch_size: int
+    ) -> Optional[list]:
+        """
+        Fetch one page of wall posts, trying several request variants.
+        The variant that worked is tried first for the owner's next pages.
+        """
+        params = {
+            "offset": offset,
+            "count": batch_size,
+            "filter": "owner"
+        }
+
+        logger.debug("Fetching posts: offset=%d, count=%d", offset, batch_size)
+
+        ladder = self._wall_ladder(owner_id, group_id)
+        best = self._wall_variant.get(owner_id)
+        if best is not None:
+            # Fall back to the whole ladder only if it stops working
+            order = [best] + [i for i in range(len(ladder)) if i != best]
+        else:
+            order = range(len(ladder))
+
+        for n, index in enumerate(order):
+            description, variant_params, use_token = ladder[index]
+            if n:
+                logger.info("Trying %s...", description)
+
+            result = await self._get_wall({**params, **variant_params}, use_token=use_token)
+            if result:
+                self._wall_variant[owner_id] = index
+                return result.get("items") or None
+
+        return None
+
+    async def _fetch_pages(
+        self,
+        owner_id: str,
+        group_id: int | str,
+        offset: int,
+        batch_size: int,
+        pages: int
+    ) -> list[Optional[list]]:
+        """
+        Fetch consecutive wall pages. Several pages are requested in one
+        VK execute call; pages it could not get are fetched one by one.
+        """
+        offsets = [offset + n * batch_size for n in range(pages)]
+        results: list = [None] * pages
+
+        if pages > 1:
+            # Same params as the variant that last worked for this owner
+            ladder = self._wall_ladder(owner_id, group_id)
+            _, variant_params, _ = ladder[self._wall_variant.get(owner_id, 0)]
+            calls = ",".join(
+                "API.wall.get(%s)" % json.dumps({
+                    **variant_params,
+                    "offset": page_offset,
+                    "count": batch_size,
+                    "filter": "owner"
+                })
+                for page_offset in offsets
+            )
+            batch = await self._make_request("execute", {"code": f"return [{calls}];"})
+            if isinstance(batch, list) and len(batch) == pages:
+                results = batch
+            else:
+                logger.info("execute failed, fetching pages one by one")
+
+        # Calls that failed inside execute come back as false
+        missing = [n for n, page in enumerate(results) if not isinstance(page, dict)]
+        fetched = await asyncio.gather(*(
+            self._fetch_page(owner_id, group_id, offsets[n], batch_size)
+            for n in missing
+        ))
+        for n, items in zip(missing, fetched):
+            results[n] = {"items": items}
+
+        return [page.get("items") or None for page in results]
+
+    async def get_posts(
         self,
         group_id: int | str,
         start_date: Optional[datetime] = None,
@@ -102,6 +459,7 @@ class VKClient:
     ) -> list:
         """
         Get posts from a group within a time range.
+        Pages needed for `count` posts are fetched concurrently.
 
         Args:
             group_id: VK group ID (numeric or screen name)
@@ -112,9 +470,11 @@ class VKClient:
         Returns:
             List of posts with attachments
         """
+        if count <= 0:
+            return []
+
         all_posts = []
         offset = 0
-        batch_size = min(count, Config.MAX_POSTS_COUNT)
 
         # Format owner_id: negative for groups, handle both int and str
         if isinstance(group_id, str):
@@ -124,82 +484,93 @@ class VKClient:
         else:
             owner_id = f"-{group_id}"
 
-        logger.info(f"Fetching posts for owner_id: {owner_id}")
-
-        while len(all_posts) < count:
-            params = {
-                "owner_id": owner_id,
-                "offset": offset,
-                "count": batch_size,
-                "filter": "owner"
-            }
-
-            logger.debug(f"Fetching posts: offset={offset}, count={batch_size}")
-            
-            # Try simple request without extended and attachments first
-            result = self._make_request("wall.get", params, use_token=False)
-            
-            # If that fails, try with token
-            if not result:
-                logger.info("Trying with token...")
-                result = self._make_request("wall.get", params, use_token=True)
-            
-            # If still fails, try with extended but without attachments
-            if not result:
-                logger.info("Trying with extended=1...")
-                params["extended"] = 1
-                result = self._make_request("wall.get", params, use_token=False)
-                
-            # Last resort: full params with token
-            if not result:
-                logger.info("Trying with full params and token...")
-                params["attachments"] = "photo,video,doc,link,note,poll,article"
-                result = self._make_request("wall.get", params, use_token=True)
-
-            if not result or not result.get("items"):
-                # Try without the minus prefix (for pages/public pages)
-                if owner_id.startswith('-') and isinstance(group_id, str):
-                    logger.info(f"Trying without minus prefix: {group_id}")
-                    params["owner_id"] = group_id
-                    params.pop("extended", None)
-                    params.pop("attachments", None)
-                    
-                    result = self._make_request("wall.get", params, use_token=False)
-                    if not result:
-                        result = self._make_request("wall.get", params, use_token=True)
-                
-                if not result or not result.get("items"):
-                    break
-
-            posts = result["items"]
-            
-            logger.info(f"Got {len(posts)} posts, filtering...")
-
-            for post in posts:
-                post_date = datetime.fromtimestamp(post["date"])
-                logger.debug(f"Post date: {post_date}, text: {post.get('text', '')[:50]}...")
-
-                # Filter by time range
-                if start_date and post_date < start_date:
-                    # Posts are sorted by date desc, so we can stop
-                    logger.info(f"Post date {post_date} < start_date {start_date}, stopping")
-                    return all_posts
-
-                if end_date and post_date > end_date:
-                    logger.debug(f"Post date {post_date} > end_date {end_date}, skipping")
-                    continue
-
-                all_posts.append(post)
-                logger.debug(f"Added post from {post_date}")
-
-                if len(all_posts) >= count:
-                    break
-
-            offset += batch_size
-
-            # If we got fewer posts than requested, no more posts available
-            if len(posts) < batch_size:
-                break
+        logger.info("Fetching posts for owner_id: %s", owner_id)
+
+        # Compare raw Unix timestamps instead of building datetimes
+        start_ts = start_date.timestamp() if start_date else None
+        end_ts = end_date.timestamp() if end_date else None
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        def fetch_round(offset: int, batch_size: int, pages: int) -> asyncio.Task:
+            return asyncio.create_task(
+                self._fetch_pages(owner_id, group_id, offset, batch_size, pages)
+            )
+
+        def remaining_round() -> tuple[int, int]:
+            """Page size and page count covering the posts still needed."""
+            remaining = count - len(all_posts)
+            batch_size = min(remaining, Config.MAX_POSTS_COUNT)
+            return batch_size, -(-remaining // batch_size)
+
+        batch_size, page_count = remaining_round()
+        next_round = fetch_round(offset, batch_size, page_count)
+        try:
+            while len(all_posts) < count:
+                # More rounds are only needed when the date filter skipped posts
+                pages = await next_round
+                offset += len(pages) * batch_size
+
+                # A full round that is entirely newer than end_date will be
+                # skipped, so the next one is needed: fetch it while filtering,
+                # scanning several pages back in one execute call
+                next_round = None
+                if (
+                    end_ts is not None
+                    and all(posts and len(posts) == batch_size for posts in pages)
+                    and pages[-1][-1]["date"] > end_ts
+                ):
+                    next_batch = Config.MAX_POSTS_COUNT
+                    next_round = fetch_round(offset, next_batch, Config.VK_EXECUTE_PAGES)
+
+                for posts in pages:
+                    if not posts:
+                        return all_posts
+
+                    logger.info("Got %d posts, filtering...", len(posts))
+                    page_size = len(posts)
+
+                    # A pinned post comes first whatever its date: check it
+                    # on its own so the rest of the page stays sorted
+                    if posts[0].get("is_pinned"):
+                        pinned, posts = posts[0], posts[1:]
+                        if (
+                            (start_ts is None or pinned["date"] >= start_ts)
+                            and (end_ts is None or pinned["date"] <= end_ts)
+                        ):
+                            all_posts.append(pinned)
+
+                    # Posts are sorted by date desc: bisect for the date window
+                    first = 0 if end_ts is None else bisect_left(posts, -end_ts, key=_neg_date)
+                    stop = (
+                        len(posts) if start_ts is None
+                        else bisect_right(posts, -start_ts, key=_neg_date)
+                    )
+                    if debug:
+                        logger.debug("Posts %d-%d of %d are in the date range", first, stop, len(posts))
+
+                    needed = count - len(all_posts)
+                    all_posts.extend(posts[first:min(stop, first + needed)])
+                    if len(all_posts) >= count:
+                        return all_posts[:count]
+
+                    if stop < len(posts):
+                        # Older posts than start_date follow, so we can stop
+                        logger.info("Reached posts older than start_date %s, stopping", start_date)
+                        return all_posts
+
+                    # If we got fewer posts than requested, no more posts available
+                    if page_size < batch_size:
+                        return all_posts
+
+                if next_round is None:
+                    # Only ask for as many posts as are still missing
+                    next_batch, page_count = remaining_round()
+                    next_round = fetch_round(offset, next_batch, page_count)
+                batch_size = next_batch
+        finally:
+            # Drop a prefetched round that is no longer needed
+            if next_round is not None and not next_round.done():
+                next_round.cancel()
 
         return all_posts
     
@@ -208,68 +579,23 @@ class VKClient:
         Extract media information from a post.
         
         Returns:
-            Dict with photos, videos, and documents info
+            Dict with lists of PhotoMedia, VideoMedia, DocumentMedia and
+            LinkMedia, the post text and its caption-sized version
         """
+        text = post.get("text", "")
         media = {
             "photos": [],
             "videos": [],
             "documents": [],
             "links": [],
-            "text": post.get("text", "")
+            "text": text,
+            # Telegram caption, trimmed once here and reused by every send
+            "caption": text[:Config.CAPTION_MAX_LENGTH] or None
         }
         
-        attachments = post.get("attachments", [])
-        
-        for attachment in attachments:
-            att_type = attachment.get("type")
-            
-            if att_type == "photo":
-                photo = attachment.get("photo", {})
-                # Get the highest resolution photo URL
-                sizes = photo.get("sizes", [])
-                if sizes:
-                    # Sort by size and get the largest
-                    sizes.sort(key=lambda x: x.get("width", 0) * x.get("height", 0), reverse=True)
-                    media["photos"].append({
-                        "url": sizes[0].get("url"),
-                        "width": sizes[0].get("width"),
-                        "height": sizes[0].get("height")
-                    })
-                elif "photo_1280" in photo:
-                    media["photos"].append({"url": photo["photo_1280"]})
-                elif "photo_807" in photo:
-                    media["photos"].append({"url": photo["photo_807"]})
-                elif "photo_604" in photo:
-                    media["photos"].append({"url": photo["photo_604"]})
-            
-            elif att_type == "video":
-                video = attachment.get("video", {})
-                media["videos"].append({
-                    "title": video.get("title", "Video"),
-                    "description": video.get("description", ""),
-                    "player": video.get("player"),
-                    "image": video.get("image"),
-                    "duration": video.get("duration", 0),
-                    "owner_id": video.get("owner_id"),
-                    "id": video.get("id")
-                })
-            
-            elif att_type == "doc":
-                doc = attachment.get("doc", {})
-                media["documents"].append({
-                    "title": doc.get("title", "Document"),
-                    "url": doc.get("url"),
-                    "size": doc.get("size", 0),
-                    "ext": doc.get("ext", "")
-                })
-            
-            elif att_type == "link":
-                link = attachment.get("link", {})
-                media["links"].append({
-                    "title": link.get("title", ""),
-                    "url": link.get("url", ""),
-                    "description": link.get("description", ""),
-                    "photo": link.get("photo", {})
-                })
+        for attachment in post.get("attachments", []):
+            handler = _ATTACHMENT_HANDLERS.get(attachment.get("type"))
+            if handler:
+                handler(attachment, media)
         
         return media